@@ -0,0 +1,102 @@
+"""
+Microbenchmark for the /chat request serialization path
+Run: python benchmark_serialization.py
+
+Compares per-request CPU time of the previous Pydantic path
+(validate -> models -> dicts -> json) against the msgspec path used by
+ollama_backend.py, at 10/100/1000 history messages. No Ollama needed.
+"""
+
+import json
+import time
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from ollama_backend import DEFAULT_MODEL, ChatResponse, build_ollama_payload, chat_request_decoder
+
+HISTORY_SIZES = [10, 100, 1000]
+SYSTEM_PROMPT = "You are a helpful AI assistant."
+OPTIONS = {"temperature": 0.8, "num_predict": 512}
+
+
+class PydanticMessage(BaseModel):
+    role: str
+    content: str
+
+
+class PydanticChatRequest(BaseModel):
+    message: str
+    character_id: Optional[str] = None
+    system_prompt: Optional[str] = None
+    memory: Optional[str] = None
+    conversation_history: Optional[List[PydanticMessage]] = []
+    model: Optional[str] = DEFAULT_MODEL
+    temperature: Optional[float] = 0.8
+    max_tokens: Optional[int] = 512
+
+
+def pydantic_path(body: bytes) -> bytes:
+    """The request handling as it was before the msgspec structs"""
+    request = PydanticChatRequest.model_validate_json(body)
+
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    for msg in request.conversation_history[-20:]:
+        messages.append({"role": msg.role, "content": msg.content})
+    messages.append({"role": "user", "content": request.message})
+
+    # httpx's json= encodes with the stdlib
+    ollama_request = json.dumps({
+        "model": request.model,
+        "messages": messages,
+        "stream": False,
+        "options": OPTIONS
+    }).encode("utf-8")
+    response = json.dumps({"response": "ok", "model_used": request.model, "timestamp": "now"}).encode("utf-8")
+    return ollama_request + response
+
+
+def msgspec_path(body: bytes) -> bytes:
+    """The request handling used by ollama_backend.py"""
+    request = chat_request_decoder.decode(body)
+    ollama_request = build_ollama_payload(request, SYSTEM_PROMPT, stream=False, options=OPTIONS)
+    response = ChatResponse(response="ok", model_used=request.model, timestamp="now").model_dump_json().encode("utf-8")
+    return ollama_request + response
+
+
+def make_body(history_size: int) -> bytes:
+    history = [
+        {
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": f"Message {i}: " + "lorem ipsum dolor sit amet " * 8
+        }
+        for i in range(history_size)
+    ]
+    return json.dumps({
+        "message": "Hello there",
+        "character_id": "hermione",
+        "system_prompt": SYSTEM_PROMPT,
+        "conversation_history": history
+    }).encode("utf-8")
+
+
+def cpu_time_per_request(path, body: bytes, min_seconds: float = 0.5) -> float:
+    """Return mean CPU seconds per call, repeating until min_seconds has elapsed"""
+    path(body)  # warm up
+    iterations = 0
+    start = time.process_time()
+    while True:
+        path(body)
+        iterations += 1
+        elapsed = time.process_time() - start
+        if elapsed >= min_seconds:
+            return elapsed / iterations
+
+
+if __name__ == "__main__":
+    print(f"{'history':>8} {'pydantic (us)':>14} {'msgspec (us)':>13} {'speedup':>8}")
+    for size in HISTORY_SIZES:
+        body = make_body(size)
+        before = cpu_time_per_request(pydantic_path, body)
+        after = cpu_time_per_request(msgspec_path, body)
+        print(f"{size:>8} {before * 1e6:>14.1f} {after * 1e6:>13.1f} {before / after:>7.1f}x")
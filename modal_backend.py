@@ -16,7 +16,7 @@ image = (
     .run_commands(
         "curl -fsSL https://ollama.com/install.sh | sh",
     )
-    .pip_install("fastapi", "pydantic", "httpx")
+    .pip_install("fastapi", "pydantic", "httpx", "msgspec", "orjson")
 )
 
 # Volume to store Ollama models
@@ -81,10 +81,16 @@ class OllamaServer:
 
     @modal.method()
     def generate(self, message: str, system_prompt: str = "", memory: str = "",
-                 conversation_history: list = None, temperature: float = 0.8,
+                 history_json: bytes = b"[]", temperature: float = 0.8,
                  max_tokens: int = 512) -> str:
-        """Generate response using Ollama"""
+        """Generate response using Ollama
+
+        history_json is the already-validated history as a JSON array; each
+        message is spliced into the Ollama body as raw bytes.
+        """
         import httpx
+        import msgspec
+        import orjson
 
         # Build messages
         messages = []
@@ -98,11 +104,7 @@ class OllamaServer:
             messages.append({"role": "system", "content": full_system})
 
         # Conversation history
-        for msg in (conversation_history or [])[-10:]:
-            messages.append({
-                "role": msg.get("role", "user"),
-                "content": msg.get("content", "")
-            })
+        messages.extend(msgspec.json.decode(history_json, type=list[msgspec.Raw])[-10:])
 
         # Current message
         messages.append({"role": "user", "content": message})
@@ -110,7 +112,7 @@ class OllamaServer:
         # Call Ollama
         response = httpx.post(
             "http://localhost:11434/api/chat",
-            json={
+            content=msgspec.json.encode({
                 "model": MODEL_NAME,
                 "messages": messages,
                 "stream": False,
@@ -118,14 +120,15 @@ class OllamaServer:
                     "temperature": temperature,
                     "num_predict": max_tokens,
                 }
-            },
+            }),
+            headers={"Content-Type": "application/json"},
             timeout=120.0,
         )
 
         if response.status_code != 200:
             raise Exception(f"Ollama error: {response.text}")
 
-        return response.json()["message"]["content"]
+        return orjson.loads(response.content)["message"]["content"]
 
 
 # Global reference
@@ -140,12 +143,13 @@ ollama = OllamaServer()
 @modal.asgi_app()
 def fastapi_app():
     """FastAPI app"""
-    from fastapi import FastAPI, HTTPException
+    from fastapi import FastAPI, HTTPException, Request
     from fastapi.middleware.cors import CORSMiddleware
     from fastapi.responses import StreamingResponse
     from pydantic import BaseModel
     from typing import Optional, List
-    import json
+    import msgspec
+    import orjson
 
     web_app = FastAPI(title="LustLingual API")
 
@@ -157,11 +161,11 @@ def fastapi_app():
         allow_headers=["*"],
     )
 
-    class ChatMessage(BaseModel):
+    class ChatMessage(msgspec.Struct):
         role: str
         content: str
 
-    class ChatRequest(BaseModel):
+    class ChatRequest(msgspec.Struct):
         message: str
         system_prompt: Optional[str] = ""
         character_id: Optional[str] = None
@@ -175,6 +179,31 @@ def fastapi_app():
         response: str
         character_id: Optional[str] = None
 
+    chat_request_decoder = msgspec.json.Decoder(ChatRequest, strict=False)
+
+    (chat_request_schema,), chat_schema_components = msgspec.json.schema_components(
+        [ChatRequest], ref_template="#/components/schemas/{name}"
+    )
+    chat_request_openapi = {
+        "requestBody": {"content": {"application/json": {"schema": chat_request_schema}}, "required": True}
+    }
+    default_openapi = web_app.openapi
+
+    def openapi_with_chat_schemas() -> dict:
+        if web_app.openapi_schema is None:
+            schema = default_openapi()
+            schema.setdefault("components", {}).setdefault("schemas", {}).update(chat_schema_components)
+        return web_app.openapi_schema
+
+    web_app.openapi = openapi_with_chat_schemas
+
+    async def decode_chat_request(raw_request: Request) -> ChatRequest:
+        try:
+            return chat_request_decoder.decode(await raw_request.body())
+        except msgspec.DecodeError as e:
+            error_type = "value_error" if isinstance(e, msgspec.ValidationError) else "json_invalid"
+            raise HTTPException(status_code=422, detail=[{"loc": ["body"], "msg": str(e), "type": error_type}])
+
     @web_app.get("/")
     async def root():
         return {
@@ -194,20 +223,20 @@ def fastapi_app():
             "available_models": [MODEL_NAME],
         }
 
-    @web_app.post("/chat", response_model=ChatResponse)
-    async def chat(request: ChatRequest):
+    @web_app.post("/chat", response_model=ChatResponse, openapi_extra=chat_request_openapi)
+    async def chat(raw_request: Request):
         """Chat endpoint"""
+        request = await decode_chat_request(raw_request)
+
         try:
-            history = [
-                {"role": msg.role, "content": msg.content}
-                for msg in (request.conversation_history or [])
-            ]
+            # generate() only uses the last 10 messages
+            history = msgspec.json.encode((request.conversation_history or [])[-10:])
 
             response = ollama.generate.remote(
                 message=request.message,
                 system_prompt=request.system_prompt or "",
                 memory=request.memory or "",
-                conversation_history=history,
+                history_json=history,
                 temperature=request.temperature,
                 max_tokens=request.max_tokens,
             )
@@ -220,14 +249,14 @@ def fastapi_app():
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
-    @web_app.post("/chat/stream")
-    async def chat_stream(request: ChatRequest):
+    @web_app.post("/chat/stream", openapi_extra=chat_request_openapi)
+    async def chat_stream(raw_request: Request):
         """Streaming endpoint (simulated)"""
+        request = await decode_chat_request(raw_request)
+
         try:
-            history = [
-                {"role": msg.role, "content": msg.content}
-                for msg in (request.conversation_history or [])
-            ]
+            # generate() only uses the last 10 messages
+            history = msgspec.json.encode((request.conversation_history or [])[-10:])
 
             async def event_generator():
                 try:
@@ -235,7 +264,7 @@ def fastapi_app():
                         message=request.message,
                         system_prompt=request.system_prompt or "",
                         memory=request.memory or "",
-                        conversation_history=history,
+                        history_json=history,
                         temperature=request.temperature,
                         max_tokens=request.max_tokens,
                     )
@@ -243,12 +272,12 @@ def fastapi_app():
                     # Stream in chunks
                     for i in range(0, len(response), 10):
                         chunk = response[i:i + 10]
-                        yield f"data: {json.dumps({'token': chunk})}\n\n"
+                        yield b"data: " + orjson.dumps({"token": chunk}) + b"\n\n"
 
-                    yield f"data: {json.dumps({'done': True})}\n\n"
+                    yield b"data: " + orjson.dumps({"done": True}) + b"\n\n"
 
                 except Exception as e:
-                    yield f"data: {json.dumps({'error': str(e)})}\n\n"
+                    yield b"data: " + orjson.dumps({"error": str(e)}) + b"\n\n"
 
             return StreamingResponse(
                 event_generator(),
@@ -3,15 +3,26 @@ Ollama Backend for NSFW Chatbot with Context & Memory Management
 Integrates with local Ollama (dolphin-mistral model)
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, ValidationError
 import httpx
-import json
-from typing import List, Optional
+import base64
+import bisect
+import binascii
+import gzip
+import msgspec
+import orjson
+from typing import List, Optional, Union
 from datetime import datetime
 import uvicorn
 
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional; gzip is always available
+    zstandard = None
+
 app = FastAPI(title="LustLingual Ollama Backend")
 
 # CORS middleware for frontend access
@@ -30,23 +41,46 @@ DEFAULT_MODEL = "dolphin-mistral"
 # In-memory storage for conversation contexts (use Redis/DB for production)
 conversation_store = {}
 
+# Context API configuration
+CONTEXT_PAGE_SIZE = 50
+CONTEXT_MAX_PAGE_SIZE = 500
+COMPRESSION_MIN_BYTES = 1024
+IMPORT_MAX_LINE_BYTES = 16 * 1024 * 1024
+
+
+class ContextMessage(BaseModel):
+    role: str
+    content: str
+
 
-class Message(BaseModel):
+# Chat bodies are decoded with msgspec; the context models above stay Pydantic
+class ChatMessage(msgspec.Struct):
     role: str
     content: str
 
 
-class ChatRequest(BaseModel):
+class ChatRequest(msgspec.Struct):
     message: str
     character_id: Optional[str] = None
     system_prompt: Optional[str] = None
     memory: Optional[str] = None
-    conversation_history: Optional[List[Message]] = []
+    conversation_history: Optional[List[ChatMessage]] = []
     model: Optional[str] = DEFAULT_MODEL
     temperature: Optional[float] = 0.8
     max_tokens: Optional[int] = 512
 
 
+class OllamaChatRequest(msgspec.Struct):
+    model: Optional[str]
+    messages: List[ChatMessage]
+    stream: bool
+    options: dict
+
+
+chat_request_decoder = msgspec.json.Decoder(ChatRequest, strict=False)
+ollama_request_encoder = msgspec.json.Encoder()
+
+
 class ChatResponse(BaseModel):
     response: str
     model_used: str
@@ -57,7 +91,72 @@ class ContextData(BaseModel):
     character_id: str
     system_prompt: str
     memory: str
-    conversation_history: List[Message]
+    conversation_history: List[ContextMessage]
+
+
+class ConversationExchange(BaseModel):
+    user: str
+    assistant: str
+    timestamp: str
+    seq: Optional[int] = None
+
+
+class SavedContext(BaseModel):
+    system_prompt: str
+    memory: str
+    history: List[ContextMessage]
+    last_updated: Optional[str] = None
+
+
+class ContextRecord(BaseModel):
+    """One NDJSON line of /contexts/export output"""
+    character_id: str
+    context: Union[List[ConversationExchange], SavedContext]
+
+
+# Publish the msgspec ChatRequest schema in OpenAPI, since /chat reads the raw body
+(chat_request_schema,), chat_schema_components = msgspec.json.schema_components(
+    [ChatRequest], ref_template="#/components/schemas/{name}"
+)
+chat_request_openapi = {
+    "requestBody": {"content": {"application/json": {"schema": chat_request_schema}}, "required": True}
+}
+_default_openapi = app.openapi
+
+
+def _openapi_with_chat_schemas() -> dict:
+    if app.openapi_schema is None:
+        schema = _default_openapi()
+        schema.setdefault("components", {}).setdefault("schemas", {}).update(chat_schema_components)
+    return app.openapi_schema
+
+
+app.openapi = _openapi_with_chat_schemas
+
+
+async def decode_chat_request(request: Request) -> ChatRequest:
+    """Validate a raw /chat body, mirroring FastAPI's 422 on bad input"""
+    try:
+        return chat_request_decoder.decode(await request.body())
+    except msgspec.DecodeError as e:
+        # ValidationError subclasses DecodeError; anything else is malformed JSON
+        error_type = "value_error" if isinstance(e, msgspec.ValidationError) else "json_invalid"
+        raise HTTPException(status_code=422, detail=[{"loc": ["body"], "msg": str(e), "type": error_type}])
+
+
+def build_ollama_payload(request: ChatRequest, system_context: str, stream: bool, options: dict) -> bytes:
+    """Encode the Ollama /api/chat body, keeping the last 20 history messages"""
+    messages = [ChatMessage(role="system", content=system_context)]
+    if request.conversation_history:
+        messages.extend(request.conversation_history[-20:])
+    messages.append(ChatMessage(role="user", content=request.message))
+
+    return ollama_request_encoder.encode(OllamaChatRequest(
+        model=request.model,
+        messages=messages,
+        stream=stream,
+        options=options
+    ))
 
 
 @app.get("/")
@@ -99,8 +198,8 @@ async def health_check():
         }
 
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+@app.post("/chat", response_model=ChatResponse, openapi_extra=chat_request_openapi)
+async def chat(raw_request: Request):
     """
     Main chat endpoint with context and memory management
 
@@ -110,6 +209,8 @@ async def chat(request: ChatRequest):
     - Memory persistence across messages
     - Streaming support (optional)
     """
+    request = await decode_chat_request(raw_request)
+
     try:
         # Build the context-aware prompt
         system_context = request.system_prompt or """You are an AI assistant that excels at roleplay and immersive storytelling.
@@ -121,35 +222,20 @@ Always maintain character consistency and provide engaging, descriptive response
         if request.memory:
             system_context += f"\n\nImportant context to remember: {request.memory}"
 
-        # Build conversation history
-        messages = [{"role": "system", "content": system_context}]
-
-        # Add conversation history (keep last 20 messages to avoid token limits)
-        if request.conversation_history:
-            history = request.conversation_history[-20:]
-            for msg in history:
-                messages.append({"role": msg.role, "content": msg.content})
-
-        # Add current user message
-        messages.append({"role": "user", "content": request.message})
+        # Build system prompt + last 20 history messages + current user message
+        ollama_request = build_ollama_payload(request, system_context, stream=False, options={
+            "temperature": request.temperature,
+            "num_predict": request.max_tokens,
+            "top_p": 0.95,
+            "top_k": 40
+        })
 
         # Call Ollama API
-        ollama_request = {
-            "model": request.model,
-            "messages": messages,
-            "stream": False,
-            "options": {
-                "temperature": request.temperature,
-                "num_predict": request.max_tokens,
-                "top_p": 0.95,
-                "top_k": 40
-            }
-        }
-
         async with httpx.AsyncClient(timeout=120.0) as client:
             response = await client.post(
                 f"{OLLAMA_BASE_URL}/api/chat",
-                json=ollama_request
+                content=ollama_request,
+                headers={"Content-Type": "application/json"}
             )
 
             if response.status_code != 200:
@@ -158,7 +244,7 @@ Always maintain character consistency and provide engaging, descriptive response
                     detail=f"Ollama API error: {response.text}"
                 )
 
-            result = response.json()
+            result = orjson.loads(response.content)
             assistant_message = result.get("message", {}).get("content", "")
 
             if not assistant_message:
@@ -172,10 +258,13 @@ Always maintain character consistency and provide engaging, descriptive response
                 if request.character_id not in conversation_store:
                     conversation_store[request.character_id] = []
 
-                conversation_store[request.character_id].append({
+                exchanges = conversation_store[request.character_id]
+                exchanges.append({
                     "user": request.message,
                     "assistant": assistant_message,
-                    "timestamp": datetime.now().isoformat()
+                    "timestamp": datetime.now().isoformat(),
+                    # Monotonic per character, so cursors survive trimming
+                    "seq": _entry_position(exchanges, len(exchanges) - 1) + 1 if exchanges else 0
                 })
 
                 # Keep only last 50 exchanges per character
@@ -205,12 +294,12 @@ Always maintain character consistency and provide engaging, descriptive response
         )
 
 
-@app.post("/chat/stream")
-async def chat_stream(request: ChatRequest):
+@app.post("/chat/stream", openapi_extra=chat_request_openapi)
+async def chat_stream(raw_request: Request):
     """
     Streaming chat endpoint for real-time token generation
     """
-    from fastapi.responses import StreamingResponse
+    request = await decode_chat_request(raw_request)
 
     async def generate():
         try:
@@ -218,65 +307,241 @@ async def chat_stream(request: ChatRequest):
             if request.memory:
                 system_context += f"\n\nContext: {request.memory}"
 
-            messages = [{"role": "system", "content": system_context}]
-
-            if request.conversation_history:
-                history = request.conversation_history[-20:]
-                for msg in history:
-                    messages.append({"role": msg.role, "content": msg.content})
-
-            messages.append({"role": "user", "content": request.message})
-
-            ollama_request = {
-                "model": request.model,
-                "messages": messages,
-                "stream": True,
-                "options": {
-                    "temperature": request.temperature,
-                    "num_predict": request.max_tokens
-                }
-            }
+            ollama_request = build_ollama_payload(request, system_context, stream=True, options={
+                "temperature": request.temperature,
+                "num_predict": request.max_tokens
+            })
 
             async with httpx.AsyncClient(timeout=120.0) as client:
                 async with client.stream(
                     "POST",
                     f"{OLLAMA_BASE_URL}/api/chat",
-                    json=ollama_request
+                    content=ollama_request,
+                    headers={"Content-Type": "application/json"}
                 ) as response:
                     async for line in response.aiter_lines():
                         if line:
                             try:
-                                data = json.loads(line)
+                                data = orjson.loads(line)
                                 if "message" in data:
                                     content = data["message"].get("content", "")
                                     if content:
-                                        yield f"data: {json.dumps({'token': content})}\n\n"
+                                        yield b"data: " + orjson.dumps({"token": content}) + b"\n\n"
 
                                 if data.get("done", False):
-                                    yield f"data: {json.dumps({'done': True})}\n\n"
+                                    yield b"data: " + orjson.dumps({"done": True}) + b"\n\n"
                                     break
-                            except json.JSONDecodeError:
+                            except orjson.JSONDecodeError:
                                 continue
         except Exception as e:
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            yield b"data: " + orjson.dumps({"error": str(e)}) + b"\n\n"
 
     return StreamingResponse(generate(), media_type="text/event-stream")
 
 
+def _conversation_entries(stored) -> list:
+    """Return the list of conversation entries for a stored context.
+
+    Contexts written by /chat are plain lists of exchanges, while contexts
+    written by /context/save are dicts holding the message list in "history".
+    Anything else (or any non-dict entry) is ignored rather than served.
+    """
+    if isinstance(stored, dict):
+        stored = stored.get("history")
+    if not isinstance(stored, list):
+        return []
+    return [entry for entry in stored if isinstance(entry, dict)]
+
+
+def _entry_position(entries: list, index: int) -> int:
+    """Stable position of an entry: its "seq" if /chat assigned one, else its index"""
+    return entries[index].get("seq", index)
+
+
+def _encode_cursor(position: int) -> str:
+    return base64.urlsafe_b64encode(f"pos:{position}".encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> int:
+    """Return the absolute position encoded in a cursor, or raise a 400"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        prefix, position = raw.split(":", 1)
+        if prefix == "pos" and position.isdigit():
+            return int(position)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        pass
+    raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+
+
+def _accepted_encodings(request: Request) -> dict:
+    """Parse Accept-Encoding into {coding: q}, dropping codings refused with q=0"""
+    accepted = {}
+    for token in request.headers.get("accept-encoding", "").split(","):
+        coding, *params = [part.strip().lower() for part in token.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted[coding] = quality
+    return accepted
+
+
+def _compressed_json(request: Request, payload: dict) -> Response:
+    """Encode a JSON payload, compressing it with zstd or gzip when accepted"""
+    body = orjson.dumps(payload)
+    headers = {"Vary": "Accept-Encoding"}
+
+    if len(body) >= COMPRESSION_MIN_BYTES:
+        accepted = _accepted_encodings(request)
+        supported = ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+        # Highest q wins; on a tie the earlier (preferred) coding is kept
+        coding = max(
+            (name for name in supported if name in accepted),
+            key=lambda name: accepted[name],
+            default=None
+        )
+        if coding == "zstd":
+            body = zstandard.ZstdCompressor().compress(body)
+            headers["Content-Encoding"] = "zstd"
+        elif coding == "gzip":
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/contexts/export")
+async def export_contexts():
+    """
+    Stream every stored context as NDJSON, one character per line
+    Useful for backups and for warming a new node via /contexts/import
+    """
+    async def generate():
+        # Snapshot the keys only, so entries are serialized one at a time
+        for character_id in list(conversation_store):
+            stored = conversation_store.get(character_id)
+            if stored is None:
+                continue
+            yield orjson.dumps({"character_id": character_id, "context": stored}) + b"\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@app.post("/contexts/import")
+async def import_contexts(request: Request):
+    """
+    Load NDJSON produced by /contexts/export into the store
+    The body is consumed line by line; only the current line is buffered, and
+    lines over IMPORT_MAX_LINE_BYTES are skipped
+    """
+    imported = 0
+    skipped = 0
+
+    def load(line: bytes):
+        nonlocal imported, skipped
+        if not line.strip():
+            return
+        try:
+            record = ContextRecord.model_validate_json(line)
+        except ValidationError:
+            skipped += 1
+            return
+
+        if isinstance(record.context, SavedContext):
+            conversation_store[record.character_id] = record.context.model_dump()
+        else:
+            # Fill in missing or out-of-order seqs so cursors stay monotonic
+            previous = -1
+            for entry in record.context:
+                if entry.seq is None or entry.seq <= previous:
+                    entry.seq = previous + 1
+                previous = entry.seq
+            conversation_store[record.character_id] = [entry.model_dump() for entry in record.context]
+        imported += 1
+
+    buffer = bytearray()
+    oversized = False
+    async for chunk in request.stream():
+        # Split only the new chunk; the buffer carries the unfinished line
+        *complete, tail = chunk.split(b"\n")
+        for piece in complete:
+            if oversized or len(buffer) + len(piece) > IMPORT_MAX_LINE_BYTES:
+                skipped += 1
+            else:
+                buffer += piece
+                load(bytes(buffer))
+            buffer.clear()
+            oversized = False
+
+        if not oversized:
+            if len(buffer) + len(tail) > IMPORT_MAX_LINE_BYTES:
+                oversized = True
+                buffer.clear()
+            else:
+                buffer += tail
+    if oversized:
+        skipped += 1
+    else:
+        load(bytes(buffer))
+
+    return {"message": "Import complete", "imported": imported, "skipped": skipped}
+
+
 @app.get("/context/{character_id}")
-async def get_context(character_id: str):
-    """Retrieve stored conversation context for a character"""
-    if character_id in conversation_store:
-        return {
-            "character_id": character_id,
-            "conversation_count": len(conversation_store[character_id]),
-            "conversations": conversation_store[character_id]
-        }
-    return {
+async def get_context(
+    request: Request,
+    character_id: str,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=CONTEXT_MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+):
+    """
+    Retrieve stored conversation context for a character
+
+    Features:
+    - Cursor-based pagination (pass back `next_cursor` to get the next page);
+      without `cursor` or `limit` the whole history is returned
+    - Field selection via a comma-separated `fields` list
+    - gzip/zstd compression based on Accept-Encoding
+    """
+    stored = conversation_store.get(character_id)
+    entries = _conversation_entries(stored)
+
+    # Cursors hold entry positions rather than list indexes, so entries
+    # trimmed by /chat between requests don't shift the page
+    offset = 0
+    if cursor:
+        offset = bisect.bisect_left(
+            range(len(entries)),
+            _decode_cursor(cursor),
+            key=lambda index: _entry_position(entries, index)
+        )
+    if limit is None:
+        limit = CONTEXT_PAGE_SIZE if cursor else len(entries)
+    page = entries[offset:offset + limit]
+
+    if fields:
+        selected = [name.strip() for name in fields.split(",") if name.strip()]
+        page = [{name: entry[name] for name in selected if name in entry} for entry in page]
+
+    next_offset = offset + len(page)
+    payload = {
         "character_id": character_id,
-        "conversation_count": 0,
-        "conversations": []
+        "conversation_count": len(entries),
+        "conversations": page,
+        "next_cursor": _encode_cursor(_entry_position(entries, next_offset)) if next_offset < len(entries) else None
     }
+    if isinstance(stored, dict):
+        payload["system_prompt"] = stored.get("system_prompt")
+        payload["memory"] = stored.get("memory")
+        payload["last_updated"] = stored.get("last_updated")
+
+    return _compressed_json(request, payload)
 
 
 @app.delete("/context/{character_id}")